@@ -0,0 +1,121 @@
+import datetime
+import logging as log
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Condition matching dates not formatted as YYYY-MM-DD. Queries must use it
+# verbatim for SQLite to pick the partial index built on it.
+UNFORMATTED_DATE = "DATE NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+
+
+def date_to_day(date):
+    "Convert a date string into a day number usable as a bitset index"
+    try:
+        return datetime.datetime.strptime(date, DATE_FORMAT).toordinal()
+    except ValueError:
+        raise ValueError('Date [%s] does not match format YYYY-MM-DD' % date)
+
+
+def day_to_date(day):
+    return datetime.date.fromordinal(day).strftime(DATE_FORMAT)
+
+
+class _IntBitsets():
+    "Per-bed bitsets stored as plain integers, one bit per night"
+
+    def __init__(self, bed_ids, nights):
+        self.masks = dict((bed_id, 0) for bed_id in bed_ids)
+
+    def set(self, bed_id, night):
+        self.masks[bed_id] |= 1 << night
+
+    def free(self, night, nights):
+        window = ((1 << nights) - 1) << night
+        return [bed_id for bed_id, mask in self.masks.items() if not mask & window]
+
+    def occupancy(self, night, nights):
+        counts = [0] * nights
+        for mask in self.masks.values():
+            window = mask >> night
+            for index in range(nights):
+                if window & (1 << index):
+                    counts[index] += 1
+        return counts
+
+
+class _NumpyBitsets():
+    "Per-bed bitsets stored as rows of a boolean matrix indexed by night"
+
+    def __init__(self, bed_ids, nights):
+        self.rows = dict((bed_id, row) for row, bed_id in enumerate(bed_ids))
+        self.matrix = numpy.zeros((len(bed_ids), nights), dtype=bool)
+
+    def set(self, bed_id, night):
+        self.matrix[self.rows[bed_id], night] = True
+
+    def free(self, night, nights):
+        busy = self.matrix[:, night:night + nights].any(axis=1)
+        return [bed_id for bed_id, row in self.rows.items() if not busy[row]]
+
+    def occupancy(self, night, nights):
+        return [int(count) for count in self.matrix[:, night:night + nights].sum(axis=0)]
+
+
+class Availability():
+    "In-memory view of bed availabilities over a window of nights, as per-bed bitsets"
+
+    def __init__(self, connection, date, nights, use_numpy = None):
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        if use_numpy and numpy is None:
+            raise RuntimeError('NumPy is not available')
+        self.start = date_to_day(date)
+        self.nights = nights
+        self.beds = {}
+        self.load(connection, use_numpy)
+
+    def load(self, connection, use_numpy):
+        "Load the bookings of the window only, the whole history is never read"
+        log.info('Loading availabilities for [%d] nights from [%s]', self.nights, day_to_date(self.start))
+        cursor = connection.cursor()
+        # Bookings are selected by comparing dates as strings, which would
+        # silently miss a date in another format and report its bed as free
+        cursor.execute("SELECT 1 FROM BOOKINGS WHERE %s LIMIT 1" % UNFORMATTED_DATE)
+        if cursor.fetchone() != None:
+            raise ValueError('Cannot load availabilities: some bookings have dates not formatted as YYYY-MM-DD')
+
+        cursor.execute("SELECT BED_ID, NAME FROM BEDS")
+        for row in cursor.fetchall():
+            self.beds[row["BED_ID"]] = row["NAME"]
+        bitsets = _NumpyBitsets if use_numpy else _IntBitsets
+        self.bitsets = bitsets(sorted(self.beds), self.nights)
+
+        # Dates of the window are mapped to nights once rather than parsed per booking
+        nights = dict((day_to_date(self.start + night), night) for night in range(self.nights))
+        cursor.execute("SELECT BED_ID, DATE FROM BOOKINGS WHERE DATE BETWEEN :START AND :END",
+                {"START": day_to_date(self.start), "END": day_to_date(self.start + self.nights - 1)})
+        for row in cursor.fetchall():
+            # A bed hosting several guests is booked as soon as one of them is
+            self.bitsets.set(row["BED_ID"], nights[row["DATE"]])
+
+    def _night(self, date, nights):
+        night = date_to_day(date) - self.start
+        if night < 0 or night + nights > self.nights:
+            raise ValueError('Nights from [%s] are outside of the loaded availabilities' % date)
+        return night
+
+    def free_beds(self, date, nights = 1):
+        "Return the names of the beds that are free on each of the given nights"
+        bed_ids = self.bitsets.free(self._night(date, nights), nights)
+        return [self.beds[bed_id] for bed_id in sorted(bed_ids)]
+
+    def occupancy(self, date, nights = 1):
+        "Return (date, number of booked beds) for each of the given nights"
+        night = self._night(date, nights)
+        counts = self.bitsets.occupancy(night, nights)
+        return [(day_to_date(self.start + night + index), count) for index, count in enumerate(counts)]
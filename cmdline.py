@@ -65,9 +65,16 @@ The available commands are (when marked with *, command is not yet implemented):
               -r, --room <name>
                   Remove room called <name>
 
+              -c, --cascade
+                  Also remove the bookings of the removed bed or guest,
+                  the beds and bookings of the removed room, and detach
+                  the removed feature from its beds, all in a single
+                  transaction
+
   register    Register a guest
               The following options are mandatory to register a guest
-              for the specified bed at the specified date:
+              for the specified bed at the specified date (formatted as
+              YYYY-MM-DD):
 
               -g, --guest <nick>
               -b, --bed <name>
@@ -81,6 +88,16 @@ The available commands are (when marked with *, command is not yet implemented):
               -b, --bed <name>
               -d, --date <date>
 
+              Several bookings can be removed at once by giving a guest,
+              a bed or both, along with a single date or a date range
+              (dates then formatted as YYYY-MM-DD):
+
+              -f, --from <date>
+                  Unregister bookings from <date> included
+
+              -t, --to <date>
+                  Unregister bookings until <date> included
+
   list        List bookings based on user-provided options
               The available options are: 
 
@@ -96,12 +113,26 @@ The available commands are (when marked with *, command is not yet implemented):
               -b, --bed <name>
                   Search for the specified bed
 
+              -a, --include-archive
+                  Also list the matching archived bookings
+
   search      Search for beds availabilities
               The following option is mandatory:
 
               -d, --date <date>
                   Search availabilities for the specified date
 
+              The following options are available:
+
+              -n, --nights <number>
+                  Search beds that are free for <number> consecutive
+                  nights starting at <date>, using in-memory bitsets
+                  (dates must then be formatted as YYYY-MM-DD)
+
+              -o, --occupancy
+                  Display the number of booked beds for each night
+                  instead of the free beds
+
   show        Show entities stored in the booking system.
               If no options are specified then all entities are shown.
               The available options are: 
@@ -126,6 +157,27 @@ The available commands are (when marked with *, command is not yet implemented):
 
   dump        Dump database objects formatted as insert queries
 
+  archive     Move past bookings to the archive database (book-archive.db)
+              The following option is mandatory:
+
+              -b, --before <date>
+                  Archive bookings made for nights before <date>
+                  (formatted as YYYY-MM-DD)
+
+              The following option is available:
+
+              -s, --batch-size <number>
+                  Number of bookings moved per transaction (default 1000)
+
+  metrics     Display, in Prometheus text format, histograms of the
+              latency, rows changed and commits of every command run
+              so far (kept in book-metrics.json), along with database
+              health gauges
+              The available options are:
+
+              -o, --output <file>
+                  Write metrics to <file> instead of the standard output
+
 '''
 
     def add(self):
@@ -147,6 +199,7 @@ The available commands are (when marked with *, command is not yet implemented):
         parser.add_argument("-f", "--feature", nargs = 1)
         parser.add_argument("-g", "--guest", nargs = 1)
         parser.add_argument("-r", "--room", nargs = 1)
+        parser.add_argument("-c", "--cascade", action='store_true')
         args = parser.parse_args(sys.argv[2:])
         if not args.bed and not args.feature and not args.guest and not args.room:
             print "At least one option is required!"
@@ -171,9 +224,19 @@ The available commands are (when marked with *, command is not yet implemented):
         parser.add_argument("-g", "--guest", nargs = 1)
         parser.add_argument("-b", "--bed", nargs = 1)
         parser.add_argument("-d", "--date", nargs = 1)
+        parser.add_argument("-f", "--from", nargs = 1, dest = 'start')
+        parser.add_argument("-t", "--to", nargs = 1, dest = 'end')
         args = parser.parse_args(sys.argv[2:])
-        if not args.guest or not args.bed or not args.date:
-            print "A guest name, bed name, and a date must be provided!"
+        if not args.guest and not args.bed:
+            print "A guest name or a bed name must be provided!"
+            print 'Try: book --help'
+            exit(1)
+        if not args.date and not args.start and not args.end:
+            print "A date or a date range must be provided!"
+            print 'Try: book --help'
+            exit(1)
+        if args.date and (args.start or args.end):
+            print "A date and a date range can't be provided together!"
             print 'Try: book --help'
             exit(1)
         self.options = args
@@ -184,6 +247,7 @@ The available commands are (when marked with *, command is not yet implemented):
         parser.add_argument("-d", "--date", nargs = 1)
         parser.add_argument("-r", "--room", nargs = 1)
         parser.add_argument("-b", "--bed", nargs = 1)
+        parser.add_argument("-a", "--include-archive", action='store_true')
         args = parser.parse_args(sys.argv[2:])
         if not args.guest and not args.date and not args.room and not args.bed:
             print "At least one option is required!"
@@ -194,11 +258,17 @@ The available commands are (when marked with *, command is not yet implemented):
     def search(self):
         parser = argparse.ArgumentParser(description = 'Search for bed availabilities')
         parser.add_argument("-d", "--date", nargs = 1)
+        parser.add_argument("-n", "--nights", nargs = 1, type = int)
+        parser.add_argument("-o", "--occupancy", action='store_true')
         args = parser.parse_args(sys.argv[2:])
         if not args.date:
             print "A date must be provided!"
             print 'Try: book --help'
             exit(1)
+        if args.nights and args.nights[0] < 1:
+            print "The number of nights must be positive!"
+            print 'Try: book --help'
+            exit(1)
         self.options = args
 
     def show(self):
@@ -227,3 +297,24 @@ The available commands are (when marked with *, command is not yet implemented):
         
     def dump(self):
         pass
+
+    def archive(self):
+        parser = argparse.ArgumentParser(description = 'Move past bookings to the archive database')
+        parser.add_argument("-b", "--before", nargs = 1)
+        parser.add_argument("-s", "--batch-size", nargs = 1, type = int)
+        args = parser.parse_args(sys.argv[2:])
+        if not args.before:
+            print "A date must be provided!"
+            print 'Try: book --help'
+            exit(1)
+        if args.batch_size and args.batch_size[0] < 1:
+            print "The batch size must be positive!"
+            print 'Try: book --help'
+            exit(1)
+        self.options = args
+
+    def metrics(self):
+        parser = argparse.ArgumentParser(description = 'Export metrics in Prometheus text format')
+        parser.add_argument("-o", "--output", nargs = 1)
+        args = parser.parse_args(sys.argv[2:])
+        self.options = args
@@ -0,0 +1,94 @@
+import fcntl
+import json
+import os
+
+class Metrics():
+    "Class to record commands activity and export it in Prometheus text format"
+
+    # Cumulative histograms per command, updated on each command run:
+    # {command: {metric: {"buckets": [count per bound], "sum": s, "count": n}}}
+    FILENAME = 'book-metrics.json'
+
+    BUCKETS = (('latency_seconds', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+               ('rows_changed', (0, 1, 10, 100, 1000, 10000, 100000)),
+               ('commits', (0, 1, 2, 5, 10, 100, 1000)))
+
+    # Database activity of the running command, summed over its connections.
+    # Only rows inserted, updated or deleted are counted, not rows read.
+    rows_changed = 0
+    commits = 0
+
+    @classmethod
+    def add_activity(cls, rows_changed, commits):
+        cls.rows_changed += rows_changed
+        cls.commits += commits
+
+    @classmethod
+    def record(cls, command, latency):
+        values = {'latency_seconds': latency, 'rows_changed': cls.rows_changed, 'commits': cls.commits}
+        cls.rows_changed = 0
+        cls.commits = 0
+
+        # Commands may run concurrently, the lock keeps them from losing samples
+        with open(cls.FILENAME + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = cls.load()
+            histograms = state.setdefault(command, {})
+            for name, buckets in cls.BUCKETS:
+                histogram = histograms.setdefault(name, {"buckets": [0] * len(buckets), "sum": 0, "count": 0})
+                for index, bound in enumerate(buckets):
+                    if values[name] <= bound:
+                        histogram["buckets"][index] += 1
+                histogram["sum"] += values[name]
+                histogram["count"] += 1
+            cls._write(cls.FILENAME, json.dumps(state))
+
+    @classmethod
+    def load(cls):
+        if not os.path.exists(cls.FILENAME):
+            return {}
+        with open(cls.FILENAME) as f:
+            return json.load(f)
+
+    @classmethod
+    def prometheus(cls, health):
+        "Format recorded histograms and the given (name, labels, value) gauges"
+        lines = []
+        state = cls.load()
+        for name, buckets in cls.BUCKETS:
+            metric = "book_command_%s" % name
+            lines.append("# TYPE %s histogram" % metric)
+            for command in sorted(state):
+                histogram = state[command].get(name)
+                if not histogram:
+                    continue
+                for bound, count in zip(buckets, histogram["buckets"]):
+                    lines.append('%s_bucket{command="%s",le="%s"} %d' % (metric, command, bound, count))
+                lines.append('%s_bucket{command="%s",le="+Inf"} %d' % (metric, command, histogram["count"]))
+                lines.append('%s_sum{command="%s"} %s' % (metric, command, histogram["sum"]))
+                lines.append('%s_count{command="%s"} %d' % (metric, command, histogram["count"]))
+
+        declared = set()
+        for name, labels, value in health:
+            if name not in declared:
+                lines.append("# TYPE %s gauge" % name)
+                declared.add(name)
+            if labels:
+                name += "{%s}" % ",".join('%s="%s"' % label for label in sorted(labels.items()))
+            lines.append("%s %s" % (name, value))
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def export(cls, health, filename = None):
+        text = cls.prometheus(health)
+        if not filename:
+            print text,
+            return
+        cls._write(filename, text)
+
+    @staticmethod
+    def _write(filename, text):
+        # Write then rename so that a reader never sees a partial file
+        with open(filename + '.tmp', 'w') as f:
+            f.write(text)
+        os.rename(filename + '.tmp', filename)
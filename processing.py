@@ -51,58 +51,72 @@ class Processing():
 
     @staticmethod
     def command_unregister(options):
-	guest_nick = options.guest[0]
-	bed_name = options.bed[0]
-	date = options.date[0]
+	guest_nick = options.guest[0] if options.guest else None
+	bed_name = options.bed[0] if options.bed else None
+	if guest_nick and bed_name and options.date:
+	    with Storage() as store:
+		store.unregister(guest_nick, bed_name, options.date[0])
+	    return
+	date = options.date[0] if options.date else None
+	start = options.start[0] if options.start else None
+	end = options.end[0] if options.end else None
 	with Storage() as store:
-	    store.unregister(guest_nick, bed_name, date)
+	    store.unregister_range(guest_nick, bed_name, date, start, end)
 
     @staticmethod
     def command_remove(options):
         if options.bed:
             bed_name = options.bed[0]
             with Storage() as store:
-                store.remove_bed(bed_name)
+                store.remove_bed(bed_name, options.cascade)
 
         if options.feature:
             feature_name = options.feature[0]
             with Storage() as store:
-                store.remove_feature(feature_name)
+                store.remove_feature(feature_name, options.cascade)
 
         if options.guest:
             guest_name = options.guest[0]
             with Storage() as store:
-                store.remove_guest(guest_name)
+                store.remove_guest(guest_name, options.cascade)
 
         if options.room:
             room_name = options.room[0]
             with Storage() as store:
-                store.remove_room(room_name)
+                store.remove_room(room_name, options.cascade)
 
     @staticmethod
     def command_list(options):
         if options.room:
             room_name = options.room[0]
             with Storage() as store:
-                store.list_room(room_name)
+                store.list_room(room_name, options.include_archive)
         if options.bed:
             bed_name = options.bed[0]
             with Storage() as store:
-                store.list_bed(bed_name)
+                store.list_bed(bed_name, options.include_archive)
         if options.guest:
             guest_nick = options.guest[0]
             with Storage() as store:
-                store.list_guest(guest_nick)
+                store.list_guest(guest_nick, options.include_archive)
         if options.date:
             date = options.date[0]
             with Storage() as store:
-                store.list_date(date)
+                store.list_date(date, options.include_archive)
 
     @staticmethod
     def command_search(options):
         date = options.date[0]
-        with Storage() as store:
-            store.search_date(date)
+        if options.nights or options.occupancy:
+            nights = options.nights[0] if options.nights else 1
+            with Storage() as store:
+                if options.occupancy:
+                    store.occupancy_range(date, nights)
+                else:
+                    store.search_range(date, nights)
+        else:
+            with Storage() as store:
+                store.search_date(date)
 
     @staticmethod
     def command_show(options):
@@ -130,3 +144,18 @@ class Processing():
         with Storage() as store:
             store.dump()
 
+    @staticmethod
+    def command_archive(options):
+        before = options.before[0]
+        with Storage() as store:
+            if options.batch_size:
+                store.archive(before, options.batch_size[0])
+            else:
+                store.archive(before)
+
+    @staticmethod
+    def command_metrics(options):
+        filename = options.output[0] if options.output else None
+        with Storage() as store:
+            store.metrics(filename)
+
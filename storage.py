@@ -1,32 +1,94 @@
+import datetime
 import logging as log
+import os
 import sqlite3
 
+from availability import Availability, DATE_FORMAT, UNFORMATTED_DATE, date_to_day
+from metrics import Metrics
+
+class Connection(sqlite3.Connection):
+    "SQLite connection counting its commits"
+
+    def __init__(self, *args, **kwargs):
+        sqlite3.Connection.__init__(self, *args, **kwargs)
+        self.commits = 0
+
+    def commit(self):
+        sqlite3.Connection.commit(self)
+        self.commits += 1
+
 class Database():
     "Class to manage interactions with database"
 
+    # Ordered schema migrations, the database user_version being the number
+    # of migrations already applied. A migration may be a generator yielding
+    # (done, total) after each batch, in which case every batch is committed
+    # on its own so that large databases are not locked during the whole run.
+    MIGRATIONS = ('create_schema',
+                  '_add_bookings_bed_date_index',
+                  '_add_bookings_date_index',
+                  '_add_bookings_unformatted_date_index',
+                  '_normalize_bookings_dates')
+
+    MIGRATION_BATCH_SIZE = 1000
+
+    # Unambiguous formats of dates registered before they were validated
+    LEGACY_DATE_FORMATS = (DATE_FORMAT, '%Y/%m/%d', '%Y.%m.%d', '%Y%m%d')
+
+    ARCHIVE_FILENAME = 'book-archive.db'
+
+    # Representative lookups whose query plans are checked for index usage
+    HEALTH_QUERIES = {
+        'archive': "SELECT BOOKING_ID FROM BOOKINGS WHERE DATE < '' ORDER BY DATE, BOOKING_ID",
+        'list_bed': "SELECT * FROM BOOKINGS WHERE BED_ID = 0",
+        'list_date': "SELECT * FROM BOOKINGS WHERE DATE = ''",
+        'list_guest': "SELECT * FROM BOOKINGS WHERE GUEST_ID = 0",
+        'search_date': "SELECT * FROM BOOKINGS WHERE BED_ID = 0 AND DATE = ''",
+    }
+
     def __init__(self):
-        self.connection = sqlite3.connect('book.db')
+        self.connection = sqlite3.connect('book.db', factory=Connection)
         self.connection.row_factory = sqlite3.Row
-        try:
-            self.sanity_checks()
-        except Exception:
-            self.create_schema()
+        self.archive_attached = False
+        self.sanity_checks()
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
+        Metrics.add_activity(self.connection.total_changes, self.connection.commits)
         self.connection.close()
 
     def sanity_checks(self):
         cursor = self.connection.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='BOOKINGS'")
-        if cursor.fetchone() == None:
-            log.info('Missing database schema, creating it')
-            raise RuntimeError('Missing schema')
-
-    def create_schema(self):
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version == 0:
+            # Databases created before schema versioning only have the base schema
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='BOOKINGS'")
+            if cursor.fetchone() == None:
+                log.info('Missing database schema, creating it')
+            else:
+                version = 1
+        if version > len(self.MIGRATIONS):
+            raise RuntimeError('Database schema version %d is newer than supported version %d'
+                               % (version, len(self.MIGRATIONS)))
+        for number in range(version + 1, len(self.MIGRATIONS) + 1):
+            self._migrate(number)
+
+    def _migrate(self, number):
+        name = self.MIGRATIONS[number - 1]
+        log.info('Migrating database schema to version %d (%s)', number, name)
         cursor = self.connection.cursor()
+        batches = getattr(self, name)(cursor)
+        if batches is not None:
+            for done, total in batches:
+                self.connection.commit()
+                log.info('Migration to version %d: %d/%d rows processed', number, done, total)
+        cursor.execute("PRAGMA user_version = %d" % number)
+        self.connection.commit()
+
+    def create_schema(self, cursor):
         cursor.executescript('''
             CREATE TABLE ROOMS (ROOM_ID INTEGER PRIMARY KEY,
                                 NAME TEXT UNIQUE NOT NULL);
@@ -61,6 +123,56 @@ class Database():
             CREATE UNIQUE INDEX IDX_BOOKINGS ON BOOKINGS(GUEST_ID, BED_ID, DATE);
         ''')
 
+    def _add_bookings_bed_date_index(self, cursor):
+        # Used by the bed and date lookups of list_*, search_date and unregister
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_BOOKINGS_BED_DATE ON BOOKINGS(BED_ID, DATE)")
+
+    def _add_bookings_date_index(self, cursor):
+        # Used by list_date and to select the bookings to archive
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_BOOKINGS_DATE ON BOOKINGS(DATE)")
+
+    def _add_bookings_unformatted_date_index(self, cursor):
+        # Partial index, empty unless dates were registered before being
+        # validated, so that finding such dates never scans BOOKINGS
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_BOOKINGS_UNFORMATTED_DATE ON BOOKINGS(DATE) WHERE %s"
+                       % UNFORMATTED_DATE)
+
+    def _normalize_bookings_dates(self, cursor):
+        # Rewrite legacy dates as YYYY-MM-DD, found through the partial index
+        # above. Dates that can't be parsed unambiguously are left untouched.
+        cursor.execute("SELECT COUNT(*) AS NB_BOOKINGS FROM BOOKINGS WHERE %s" % UNFORMATTED_DATE)
+        total = cursor.fetchone()["NB_BOOKINGS"]
+        done = 0
+        last_id = 0
+        while True:
+            cursor.execute("SELECT BOOKING_ID, DATE FROM BOOKINGS WHERE %s AND BOOKING_ID > :LAST "
+                           "ORDER BY BOOKING_ID LIMIT :BATCH" % UNFORMATTED_DATE,
+                           {"LAST": last_id, "BATCH": self.MIGRATION_BATCH_SIZE})
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                date = self._parse_legacy_date(row["DATE"])
+                if date == None:
+                    log.warn('Booking [%d] has unsupported date [%s], leaving it as is', row["BOOKING_ID"], row["DATE"])
+                    continue
+                try:
+                    cursor.execute("UPDATE BOOKINGS SET DATE = :DATE WHERE BOOKING_ID = :ID",
+                                   {"DATE": date, "ID": row["BOOKING_ID"]})
+                except sqlite3.IntegrityError:
+                    log.warn('Booking [%d] duplicates another booking on [%s], leaving it as is', row["BOOKING_ID"], date)
+            done += len(rows)
+            last_id = rows[-1]["BOOKING_ID"]
+            yield done, total
+
+    def _parse_legacy_date(self, date):
+        for legacy_format in self.LEGACY_DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(date, legacy_format).strftime(DATE_FORMAT)
+            except ValueError:
+                pass
+        return None
+
     def add_room(self, name):
         log.info('Adding room [%s] to the database', name)
         cursor = self.connection.cursor()
@@ -123,6 +235,14 @@ class Database():
             log.warn(str(e))
             exit(1)
 
+        # Availability searches, archiving and date ranges rely on YYYY-MM-DD dates
+        try:
+            date_to_day(date)
+        except ValueError as e:
+            print str(e)
+            log.warn(str(e))
+            exit(1)
+
         cursor = self.connection.cursor()
         cursor.execute("INSERT INTO BOOKINGS (GUEST_ID,BED_ID,DATE) VALUES (:GUEST,:BED,:DATE)",{"GUEST":guest_id,"BED":bed_id,"DATE":date})
         self.connection.commit()
@@ -141,7 +261,40 @@ class Database():
         cursor.execute("DELETE FROM BOOKINGS WHERE BOOKING_ID = :ID",{"ID":booking_id})
         self.connection.commit()
 
-    def remove_bed(self, name):
+    def unregister_range(self, guest = None, bed = None, date = None, start = None, end = None):
+        log.info('Unregistering guest [%s] for bed [%s] on [%s] from [%s] to [%s]', guest, bed, date, start, end)
+        conditions = []
+        params = {}
+        try:
+            if guest:
+                conditions.append("GUEST_ID = :GUEST_ID")
+                params["GUEST_ID"] = self._get_guest_id(guest)
+            if bed:
+                conditions.append("BED_ID = :BED_ID")
+                params["BED_ID"] = self._get_bed_id(bed)
+            # A single date is matched as is, so that bookings registered
+            # before dates were validated can still be removed
+            if date:
+                conditions.append("DATE = :DATE")
+                params["DATE"] = date
+            if start:
+                date_to_day(start)
+                conditions.append("DATE >= :START")
+                params["START"] = start
+            if end:
+                date_to_day(end)
+                conditions.append("DATE <= :END")
+                params["END"] = end
+        except ValueError as e:
+            print str(e)
+            log.warn(str(e))
+            exit(1)
+
+        nb_bookings = self._delete_bookings(" AND ".join(conditions), params)
+        self.connection.commit()
+        print "Unregistered %d bookings" % nb_bookings
+
+    def remove_bed(self, name, cascade = False):
         log.info('Removing bed [%s] from the database', name)
         cursor = self.connection.cursor()
         try:
@@ -151,20 +304,25 @@ class Database():
             log.warn(str(e))
             exit(1)
 
-        # Now check if bookings exist for this bed, in which case they must be removed first
-        cursor.execute("SELECT COUNT(*) AS NB_BOOKINGS FROM BOOKINGS WHERE BED_ID = :ID",{"ID":bed_id})
-        resultset = cursor.fetchone()
-        if resultset != None:
-            nb_bookings = resultset["NB_BOOKINGS"]
-            if nb_bookings != 0:
-                print "Some bookings exist for this bed, please remove them first!"
-                log.warn('Bookings registered for bed [%s], can\'t remove it', name)
-                exit(1)
+        if cascade:
+            nb_bookings = self._delete_bookings("BED_ID = :ID", {"ID":bed_id})
+        else:
+            # Now check if bookings exist for this bed, in which case they must be removed first
+            cursor.execute("SELECT COUNT(*) AS NB_BOOKINGS FROM BOOKINGS WHERE BED_ID = :ID",{"ID":bed_id})
+            resultset = cursor.fetchone()
+            if resultset != None:
+                nb_bookings = resultset["NB_BOOKINGS"]
+                if nb_bookings != 0:
+                    print "Some bookings exist for this bed, please remove them first!"
+                    log.warn('Bookings registered for bed [%s], can\'t remove it', name)
+                    exit(1)
 
         cursor.execute("DELETE FROM BEDS WHERE BED_ID = :ID",{"ID":bed_id})
         self.connection.commit()
+        if cascade:
+            print "Removed bed [%s] and %d bookings" % (name, nb_bookings)
 
-    def remove_feature(self, name):
+    def remove_feature(self, name, cascade = False):
         log.info('Removing feature [%s] from the database', name)
         cursor = self.connection.cursor()
 
@@ -175,20 +333,27 @@ class Database():
             log.warn(str(e))
             exit(1)
 
-        # Now check if beds have this feature, in which case they must be removed first
-        cursor.execute("SELECT COUNT(*) AS NB_BEDS FROM BEDS WHERE FEATURE_ID = :ID",{"ID":feature_id})
-        resultset = cursor.fetchone()
-        if resultset != None:
-            nb_beds = resultset["NB_BEDS"]
-            if nb_beds != 0:
-                print "Some beds are registered with this feature, please remove them first!"
-                log.warn('Beds registered with feature [%s], can\'t remove it', name)
-                exit(1)
+        if cascade:
+            # Beds are kept, only without this feature
+            cursor.execute("UPDATE BEDS SET FEATURE_ID = NULL WHERE FEATURE_ID = :ID",{"ID":feature_id})
+            nb_beds = cursor.rowcount
+        else:
+            # Now check if beds have this feature, in which case they must be removed first
+            cursor.execute("SELECT COUNT(*) AS NB_BEDS FROM BEDS WHERE FEATURE_ID = :ID",{"ID":feature_id})
+            resultset = cursor.fetchone()
+            if resultset != None:
+                nb_beds = resultset["NB_BEDS"]
+                if nb_beds != 0:
+                    print "Some beds are registered with this feature, please remove them first!"
+                    log.warn('Beds registered with feature [%s], can\'t remove it', name)
+                    exit(1)
 
         cursor.execute("DELETE FROM FEATURES WHERE FEATURE_ID = :ID",{"ID":feature_id})
         self.connection.commit()
+        if cascade:
+            print "Removed feature [%s] from %d beds" % (name, nb_beds)
 
-    def remove_guest(self, nickname):
+    def remove_guest(self, nickname, cascade = False):
         log.info('Removing guest [%s] from the database', nickname)
         cursor = self.connection.cursor()
 
@@ -199,20 +364,25 @@ class Database():
             log.warn(str(e))
             exit(1)
 
-        # Now check if bookings exist for this guest, in which case they must be removed first
-        cursor.execute("SELECT COUNT(*) AS NB_BOOKINGS FROM BOOKINGS WHERE GUEST_ID = :ID",{"ID":guest_id})
-        resultset = cursor.fetchone()
-        if resultset != None:
-            nb_bookings = resultset["NB_BOOKINGS"]
-            if nb_bookings != 0:
-                print "Some bookings exist for this guest, please remove them first!"
-                log.warn('Bookings registered for guest [%s], can\'t remove it', nickname)
-                exit(1)
+        if cascade:
+            nb_bookings = self._delete_bookings("GUEST_ID = :ID", {"ID":guest_id})
+        else:
+            # Now check if bookings exist for this guest, in which case they must be removed first
+            cursor.execute("SELECT COUNT(*) AS NB_BOOKINGS FROM BOOKINGS WHERE GUEST_ID = :ID",{"ID":guest_id})
+            resultset = cursor.fetchone()
+            if resultset != None:
+                nb_bookings = resultset["NB_BOOKINGS"]
+                if nb_bookings != 0:
+                    print "Some bookings exist for this guest, please remove them first!"
+                    log.warn('Bookings registered for guest [%s], can\'t remove it', nickname)
+                    exit(1)
 
         cursor.execute("DELETE FROM GUESTS WHERE GUEST_ID = :ID",{"ID":guest_id})
         self.connection.commit()
+        if cascade:
+            print "Removed guest [%s] and %d bookings" % (nickname, nb_bookings)
 
-    def remove_room(self, name):
+    def remove_room(self, name, cascade = False):
         log.info('Removing room [%s] from the database', name)
         cursor = self.connection.cursor()
 
@@ -223,24 +393,37 @@ class Database():
             log.warn(str(e))
             exit(1)
 
-        # Now check if beds are found for this room, in which case they must be removed first
-        cursor.execute("SELECT COUNT(*) AS NB_BEDS FROM BEDS WHERE ROOM_ID = :ID",{"ID":room_id})
-        resultset = cursor.fetchone()
-        if resultset != None:
-            nb_beds = resultset["NB_BEDS"]
-            if nb_beds != 0:
-                print "Some beds are registered for this room, please remove them first!"
-                log.warn('Beds registered for room [%s], can\'t remove it', name)
-                exit(1)
+        if cascade:
+            nb_bookings = self._delete_bookings(
+                    "BED_ID IN (SELECT BED_ID FROM BEDS WHERE ROOM_ID = :ID)", {"ID":room_id})
+            cursor.execute("DELETE FROM BEDS WHERE ROOM_ID = :ID",{"ID":room_id})
+            nb_beds = cursor.rowcount
+        else:
+            # Now check if beds are found for this room, in which case they must be removed first
+            cursor.execute("SELECT COUNT(*) AS NB_BEDS FROM BEDS WHERE ROOM_ID = :ID",{"ID":room_id})
+            resultset = cursor.fetchone()
+            if resultset != None:
+                nb_beds = resultset["NB_BEDS"]
+                if nb_beds != 0:
+                    print "Some beds are registered for this room, please remove them first!"
+                    log.warn('Beds registered for room [%s], can\'t remove it', name)
+                    exit(1)
 
         cursor.execute("DELETE FROM ROOMS WHERE ROOM_ID = :ID",{"ID":room_id})
         self.connection.commit()
+        if cascade:
+            print "Removed room [%s], %d beds and %d bookings" % (name, nb_beds, nb_bookings)
 
-    def list_room(self, name):
+    def list_room(self, name, include_archive = False):
         log.info('Listing bookings for room [%s]', name)
         try:
             room_id = self._get_room_id(name)
         except ValueError as e:
+            # Archived bookings are kept after the entity has been removed
+            if include_archive:
+                log.info(str(e))
+                self._list_archive("ROOM_NAME = :ROOM_NAME", {"ROOM_NAME": name})
+                return
             print str(e)
             log.warn(str(e))
             exit(1)
@@ -258,12 +441,19 @@ class Database():
         rows = cursor.fetchall()
         for row in rows:
             print "Guest [%s], Bed [%s], Date [%s]" % (row["NICKNAME"], row["NAME"], row["DATE"])
+        if include_archive:
+            self._list_archive("ROOM_NAME = :ROOM_NAME", {"ROOM_NAME": name})
 
-    def list_bed(self, name):
+    def list_bed(self, name, include_archive = False):
         log.info('Listing bookings for bed [%s]', name)
         try:
             bed_id = self._get_bed_id(name)
         except ValueError as e:
+            # Archived bookings are kept after the entity has been removed
+            if include_archive:
+                log.info(str(e))
+                self._list_archive("BED_NAME = :BED_NAME", {"BED_NAME": name})
+                return
             print str(e)
             log.warn(str(e))
             exit(1)
@@ -280,13 +470,20 @@ class Database():
         rows = cursor.fetchall()
         for row in rows:
             print "Guest [%s], Bed [%s], Date [%s]" % (row["NICKNAME"], row["NAME"], row["DATE"])
+        if include_archive:
+            self._list_archive("BED_NAME = :BED_NAME", {"BED_NAME": name})
 
 
-    def list_guest(self, nick):
+    def list_guest(self, nick, include_archive = False):
         log.info('Listing bookings for guest [%s]', nick)
         try:
             guest_id = self._get_guest_id(nick)
         except ValueError as e:
+            # Archived bookings are kept after the entity has been removed
+            if include_archive:
+                log.info(str(e))
+                self._list_archive("NICKNAME = :NICKNAME", {"NICKNAME": nick})
+                return
             print str(e)
             log.warn(str(e))
             exit(1)
@@ -303,8 +500,10 @@ class Database():
         rows = cursor.fetchall()
         for row in rows:
             print "Guest [%s], Bed [%s], Date [%s]" % (row["NICKNAME"], row["NAME"], row["DATE"])
+        if include_archive:
+            self._list_archive("NICKNAME = :NICKNAME", {"NICKNAME": nick})
 
-    def list_date(self, date):
+    def list_date(self, date, include_archive = False):
         log.info('Listing bookings for date [%s]', date)
         query = '''
             SELECT GUESTS.NICKNAME, BEDS.NAME, BOOKINGS.DATE
@@ -318,6 +517,8 @@ class Database():
         rows = cursor.fetchall()
         for row in rows:
             print "Guest [%s], Bed [%s], Date [%s]" % (row["NICKNAME"], row["NAME"], row["DATE"])
+        if include_archive:
+            self._list_archive("DATE = :DATE", {"DATE": date})
 
     def search_date(self, date):
         log.info('Searching availabilities for [%s]', date)
@@ -333,6 +534,78 @@ class Database():
         for row in rows:
             print "Bed [%s]" % row["NAME"]
 
+    def archive(self, before, batch_size = 1000):
+        log.info('Archiving bookings before [%s]', before)
+        try:
+            date_to_day(before)
+        except ValueError as e:
+            print str(e)
+            log.warn(str(e))
+            exit(1)
+
+        # Dates are compared as strings, which only orders YYYY-MM-DD dates correctly
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) AS NB_BOOKINGS FROM BOOKINGS WHERE %s" % UNFORMATTED_DATE)
+        nb_bookings = cursor.fetchone()["NB_BOOKINGS"]
+        if nb_bookings != 0:
+            print "%d bookings have dates not formatted as YYYY-MM-DD, please fix them first!" % nb_bookings
+            log.warn('Bookings with unsupported date format found, can\'t archive')
+            exit(1)
+
+        self._attach_archive(create = True)
+        # Bookings are moved batch by batch, each batch in its own transaction,
+        # so that the hot database is never locked for the whole run
+        batch = '''
+            SELECT BOOKING_ID FROM BOOKINGS
+            WHERE DATE < :BEFORE
+            ORDER BY DATE, BOOKING_ID
+            LIMIT :BATCH
+            '''
+        query = '''
+            INSERT INTO ARCHIVE.BOOKINGS (GUEST_ID, BED_ID, DATE, NICKNAME, BED_NAME, ROOM_NAME)
+            SELECT BOOKINGS.GUEST_ID, BOOKINGS.BED_ID, BOOKINGS.DATE,
+                   GUESTS.NICKNAME, BEDS.NAME, ROOMS.NAME
+            FROM BOOKINGS
+            LEFT JOIN GUESTS ON (GUESTS.GUEST_ID = BOOKINGS.GUEST_ID)
+            LEFT JOIN BEDS ON (BEDS.BED_ID = BOOKINGS.BED_ID)
+            LEFT JOIN ROOMS ON (ROOMS.ROOM_ID = BEDS.ROOM_ID)
+            WHERE BOOKINGS.BOOKING_ID IN (%s)
+            ''' % batch
+        params = {"BEFORE": before, "BATCH": batch_size}
+        total = 0
+        while True:
+            cursor.execute(query, params)
+            if cursor.rowcount <= 0:
+                break
+            cursor.execute("DELETE FROM BOOKINGS WHERE BOOKING_ID IN (%s)" % batch, params)
+            self.connection.commit()
+            total += cursor.rowcount
+            log.info('Archived %d bookings so far', total)
+        self.connection.rollback()
+        print "Archived %d bookings" % total
+
+    def search_range(self, date, nights):
+        log.info('Searching availabilities for [%s] nights from [%s]', nights, date)
+        try:
+            beds = Availability(self.connection, date, nights).free_beds(date, nights)
+        except ValueError as e:
+            print str(e)
+            log.warn(str(e))
+            exit(1)
+        for bed in beds:
+            print "Bed [%s]" % bed
+
+    def occupancy_range(self, date, nights):
+        log.info('Computing occupancy for [%s] nights from [%s]', nights, date)
+        try:
+            occupancy = Availability(self.connection, date, nights).occupancy(date, nights)
+        except ValueError as e:
+            print str(e)
+            log.warn(str(e))
+            exit(1)
+        for day, count in occupancy:
+            print "Date [%s], Booked beds [%d]" % (day, count)
+
     def show_entity(self, entity):
         print "%s:" % entity
         cursor = self.connection.cursor()
@@ -356,16 +629,79 @@ class Database():
             count = cursor.fetchone()
             print "%s | %d" % (table, count["NUM"])
 
+    def health(self):
+        "Return database health gauges as (name, labels, value) tuples"
+        log.info('Gathering database health')
+        gauges = []
+        cursor = self.connection.cursor()
+        for pragma in ('user_version', 'page_count', 'page_size', 'freelist_count'):
+            cursor.execute("PRAGMA %s" % pragma)
+            gauges.append(("book_db_%s" % pragma, {}, cursor.fetchone()[0]))
+        wal = 'book.db-wal'
+        gauges.append(("book_db_wal_bytes", {}, os.path.getsize(wal) if os.path.exists(wal) else 0))
+
+        # A lookup falling back to a full table or index scan means an index is missing
+        for name, query in sorted(self.HEALTH_QUERIES.items()):
+            cursor.execute("EXPLAIN QUERY PLAN %s" % query)
+            scans = [row[-1] for row in cursor.fetchall() if row[-1].startswith('SCAN')]
+            gauges.append(("book_query_uses_index", {"query": name}, 0 if scans else 1))
+        return gauges
+
+    def metrics(self, filename = None):
+        Metrics.export(self.health(), filename)
+
     def dump(self):
         for line in self.connection.iterdump():
             print "%s\n" % line
 
+    def _delete_bookings(self, condition, params):
+        "Delete the bookings matching condition without committing, return their number"
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM BOOKINGS WHERE %s" % condition, params)
+        return cursor.rowcount
+
+    def _attach_archive(self, create = False):
+        if self.archive_attached:
+            return
+        cursor = self.connection.cursor()
+        cursor.execute("ATTACH DATABASE :FILENAME AS ARCHIVE", {"FILENAME": self.ARCHIVE_FILENAME})
+        self.archive_attached = True
+        if not create:
+            return
+        # Archived bookings keep the names they were made with, as guests,
+        # beds and rooms may since have been removed from the hot database
+        cursor.executescript('''
+            CREATE TABLE IF NOT EXISTS ARCHIVE.BOOKINGS (GUEST_ID INTEGER NOT NULL,
+                                                         BED_ID INTEGER NOT NULL,
+                                                         DATE TEXT NOT NULL,
+                                                         NICKNAME TEXT,
+                                                         BED_NAME TEXT,
+                                                         ROOM_NAME TEXT);
+            CREATE INDEX IF NOT EXISTS ARCHIVE.IDX_BOOKINGS_DATE ON BOOKINGS(DATE);
+        ''')
+
+    def _list_archive(self, condition, params):
+        # Listing must not create the archive, nothing has been archived yet
+        if not os.path.exists(self.ARCHIVE_FILENAME):
+            return
+        self._attach_archive()
+        query = '''
+            SELECT NICKNAME, BED_NAME, DATE
+            FROM ARCHIVE.BOOKINGS
+            WHERE %s
+            ''' % condition
+        cursor = self.connection.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        for row in rows:
+            print "Guest [%s], Bed [%s], Date [%s] (archived)" % (row["NICKNAME"], row["BED_NAME"], row["DATE"])
+
     def _get_room_id(self, room_name):
         cursor = self.connection.cursor()
         cursor.execute("SELECT ROOM_ID FROM ROOMS WHERE NAME=:NAME",{"NAME": room_name})
         resultset = cursor.fetchone()
         if resultset == None:
-            raise ValueError('Room [%s] not found' % name)
+            raise ValueError('Room [%s] not found' % room_name)
         return resultset["ROOM_ID"]
 
     def _get_guest_id(self, guest_nick):